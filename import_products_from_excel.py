@@ -5,11 +5,14 @@ import argparse
 import os
 import sys
 import base64
-import xmlrpc.client
-from typing import Any, Dict, List, Optional, Tuple
+import functools
+import hashlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 
 # =========================
@@ -21,9 +24,57 @@ ODOO_DB = os.getenv("ODOO_DB", "Testing")
 ODOO_USER = os.getenv("ODOO_USER", "admin")
 ODOO_PASSWORD = os.getenv("ODOO_PASSWORD", "admin")
 
+# Tope de hilos contra una sola instancia de Odoo (default: núcleos, mínimo 2)
+ODOO_MAX_WORKERS = os.getenv("ODOO_MAX_WORKERS")
+
+# Por encima de esto se avisa: Odoo suele tener pocos workers propios
+WORKERS_WARN_THRESHOLD = 16
+
+# Filas por cada llamada a product.template.load()
+BATCH_SIZE = 500
+
+# Prefijo de los external id que se asignan a los productos nuevos
+XMLID_PREFIX = "__import__.sku_"
+
+# Campos de vals cuyo nombre de columna en load() es distinto
+LOAD_FIELD_NAMES = {"categ_id": "categ_id/.id"}
+
+# Valores por cada search_read de existencia (default_code / name)
+LOOKUP_CHUNK_SIZE = 1000
+
+# Líneas de progreso que se acumulan antes de escribir a stdout
+OUTPUT_FLUSH_EVERY = 100
+
+# Valores de celda que se interpretan como verdadero
+_TRUE_SET = frozenset({"1", "true", "t", "si", "sí", "yes", "y", "x", "s"})
+
+# Tipos de columna que prepare_dataframe coerciona de forma vectorizada
+BOOL_COLUMNS = ("available_in_pos", "purchase_ok", "sale_ok", "is_storable")
+FLOAT_COLUMNS = ("list_price", "standard_price")
+STR_COLUMNS = (
+    "default_code",
+    "name",
+    "categ_id/id",
+    "categoria de producto / external id",
+    "supplier_code",
+    "brand",
+    "barcode",
+)
+
+# Columna auxiliar con el código Categorical de la categoría de cada fila
+CATEG_CODE_COLUMN = "_categ_code"
+
 # Thread local: un cliente/importer por hilo
 _thread_local = threading.local()
 
+# uid de Odoo por (url, db, user, sha256(password)), compartido entre hilos
+_uid_cache: Dict[Tuple[str, str, str, str], int] = {}
+_uid_lock = threading.Lock()
+
+# Índice de categorías precargado, compartido entre hilos: (url, db, user) -> dict
+_category_index_cache: Dict[Tuple[str, str, str], Dict[str, int]] = {}
+_category_index_lock = threading.Lock()
+
 
 # =========================
 # HELPERS GENERALES
@@ -34,19 +85,31 @@ def _to_bool(v: Any) -> bool:
         return False
     if isinstance(v, bool):
         return v
-    return str(v).strip().lower() in ("1", "true", "t", "si", "sí", "yes", "y", "x", "s")
+    return _str_to_bool(str(v))
+
+
+@functools.lru_cache(maxsize=256)
+def _str_to_bool(v: str) -> bool:
+    # una planilla tiene pocos valores distintos ("Si", "x", "0", ...)
+    return v.strip().lower() in _TRUE_SET
 
 
 def _to_float(v: Any) -> float:
-    if v is None or v == "":
+    # ya coercionado por prepare_dataframe
+    if isinstance(v, float):
+        return v
+    v = _safe_str(v)
+    if not v:
         return 0.0
     try:
-        return float(str(v).replace(",", "."))
+        return float(v.replace(",", "."))
     except Exception:
         return 0.0
 
 
 def _safe_str(v: Any) -> str:
+    if isinstance(v, str):
+        return v.strip()
     try:
         if pd.isna(v):
             return ""
@@ -56,43 +119,122 @@ def _safe_str(v: Any) -> str:
 
 
 # =========================
-# CLIENTE ODOO (XML-RPC)
+# CLIENTE ODOO (JSON-RPC)
 # =========================
 
-class OdooClient:
-    def __init__(self, url: str, db: str, user: str, password: str):
+def make_session(pool_size: int) -> requests.Session:
+    """
+    Sesión HTTP keep-alive compartida por todos los hilos.
+    El pool permite una conexión abierta por worker.
+    """
+    session = requests.Session()
+    session.headers["Content-Type"] = "application/json"
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class OdooRpcError(RuntimeError):
+    """Odoo respondió con un error (la llamada llegó, pero fue rechazada)."""
+
+
+class _BatchWideError(Exception):
+    """Una mitad repitió en su primer intento el error del lote padre."""
+
+
+class OdooJsonClient:
+    def __init__(
+        self,
+        url: str,
+        db: str,
+        user: str,
+        password: str,
+        session: Optional[requests.Session] = None,
+    ):
         self.url = url.rstrip("/")
         self.db = db
         self.user = user
         self.password = password
+        self.session = session or make_session(1)
+        self.uid = self.authenticate(
+            self.session, self.url, self.db, self.user, self.password
+        )
 
-        common = xmlrpc.client.ServerProxy(f"{self.url}/xmlrpc/2/common")
-        self.uid = common.authenticate(self.db, self.user, self.password, {})
-        if not self.uid:
-            raise RuntimeError("Error autenticando en Odoo.")
+    @classmethod
+    def authenticate(
+        cls, session: requests.Session, url: str, db: str, user: str, password: str
+    ) -> int:
+        """
+        Login contra Odoo, una sola vez por (url, db, user, password):
+        los clientes de los demás hilos reutilizan el uid cacheado.
+        """
+        key = (url, db, user, hashlib.sha256(password.encode("utf-8")).hexdigest())
+        with _uid_lock:
+            uid = _uid_cache.get(key)
+            if uid is None:
+                uid = cls._post(session, url, "common", "authenticate", [db, user, password, {}])
+                if not uid:
+                    raise RuntimeError("Error autenticando en Odoo.")
+                _uid_cache[key] = uid
+        return uid
+
+    @staticmethod
+    def _post(
+        session: requests.Session, url: str, service: str, method: str, args: List
+    ) -> Any:
+        payload = {
+            "jsonrpc": "2.0",
+            "method": "call",
+            "params": {"service": service, "method": method, "args": args},
+        }
+        resp = session.post(f"{url}/jsonrpc", json=payload)
+        resp.raise_for_status()
+        data = resp.json()
+        if data.get("error"):
+            err = data["error"]
+            detail = (err.get("data") or {}).get("message") or err.get("message")
+            raise OdooRpcError(f"Odoo: {detail}")
+        return data.get("result")
+
+    def _rpc(self, service: str, method: str, args: List) -> Any:
+        return self._post(self.session, self.url, service, method, args)
+
+    def _call(
+        self, model: str, method: str, args: List, kwargs: Optional[Dict] = None
+    ) -> Any:
+        return self._rpc(
+            "object",
+            "execute_kw",
+            [self.db, self.uid, self.password, model, method, args, kwargs or {}],
+        )
 
-        self.models = xmlrpc.client.ServerProxy(f"{self.url}/xmlrpc/2/object")
+    def version(self) -> Dict:
+        return self._rpc("common", "version", [])
 
     def search(self, model: str, domain: List, limit: int = 0) -> List[int]:
-        return self.models.execute_kw(
-            self.db, self.uid, self.password, model, "search", [domain],
-            {"limit": limit} if limit else {},
-        )
+        return self._call(model, "search", [domain], {"limit": limit} if limit else {})
 
-    def create(self, model: str, vals: Dict) -> int:
-        return self.models.execute_kw(
-            self.db, self.uid, self.password, model, "create", [vals]
-        )
+    def create(self, model: str, vals: Union[Dict, List[Dict]]) -> Union[int, List[int]]:
+        # Odoo acepta una lista de vals y devuelve la lista de ids
+        return self._call(model, "create", [vals])
 
     def write(self, model: str, ids: List[int], vals: Dict) -> bool:
-        return self.models.execute_kw(
-            self.db, self.uid, self.password, model, "write", [ids, vals]
-        )
+        return self._call(model, "write", [ids, vals])
 
     def read(self, model: str, ids: List[int], fields: List[str]):
-        return self.models.execute_kw(
-            self.db, self.uid, self.password, model, "read", [ids, fields]
-        )
+        return self._call(model, "read", [ids, fields])
+
+    def load(self, model: str, fields: List[str], data: List[List[str]]) -> Dict:
+        return self._call(model, "load", [fields, data])
+
+    def search_read(
+        self, model: str, domain: List, fields: List[str], limit: int = 0
+    ) -> List[Dict]:
+        kwargs: Dict[str, Any] = {"fields": fields}
+        if limit:
+            kwargs["limit"] = limit
+        return self._call(model, "search_read", [domain], kwargs)
 
 
 # =========================
@@ -100,199 +242,566 @@ class OdooClient:
 # =========================
 
 class ProductImporter:
-    def __init__(self, client: OdooClient, base_dir: str = "."):
+    def __init__(self, client: OdooJsonClient, base_dir: str = "."):
         self.client = client
         self.base_dir = base_dir
+        self._load_category_index()
 
     # ---------- CATEGORÍA ----------
+    def _load_category_index(self) -> None:
+        """
+        Carga product.category e ir.model.data una sola vez y arma el índice
+        en memoria. Se comparte entre hilos vía _category_index_cache.
+        """
+        key = (self.client.url, self.client.db, self.client.user)
+        with _category_index_lock:
+            index = _category_index_cache.get(key)
+            if index is None:
+                index = self._fetch_category_index()
+                _category_index_cache[key] = index
+        self._cat_unified = index
+
+    def _fetch_category_index(self) -> Dict[str, int]:
+        """
+        Un solo dict texto -> categ_id con todas las formas aceptadas por
+        'categ_id/id'. Se insertan en orden de prioridad y gana la primera:
+        1) ID numérico
+        2) module.external_id
+        3) external_id solo
+        4) nombre de categoría
+        Dentro de cada forma gana el primero según el orden de Odoo,
+        igual que search(limit=1).
+        """
+        categories = self.client.search_read("product.category", [], ["id", "name"])
+        xmlids = [
+            rec
+            for rec in self.client.search_read(
+                "ir.model.data",
+                [("model", "=", "product.category")],
+                ["name", "module", "res_id"],
+            )
+            if rec.get("res_id")
+        ]
+
+        unified: Dict[str, int] = {}
+        for rec in categories:
+            unified.setdefault(str(rec["id"]), rec["id"])
+        for rec in xmlids:
+            unified.setdefault(f"{rec['module']}.{rec['name']}", rec["res_id"])
+        for rec in xmlids:
+            unified.setdefault(rec["name"], rec["res_id"])
+        for rec in categories:
+            unified.setdefault(rec["name"], rec["id"])
+        return unified
+
     def ensure_category(self, value: str) -> Optional[int]:
         """
-        Emula comportamiento de 'categ_id/id':
-        - ID numérico
-        - module.external_id
-        - external_id solo
-        - nombre de categoría
+        Emula comportamiento de 'categ_id/id' (sin llamadas a Odoo):
+        ID numérico, module.external_id, external_id solo o nombre de
+        categoría, todos resueltos con una sola búsqueda en _cat_unified.
         """
         value = _safe_str(value)
         if not value:
             return None
 
-        # 1) ID numérico
-        if value.isdigit():
-            ids = self.client.search(
-                "product.category", [("id", "=", int(value))], limit=1
-            )
-            if ids:
-                return ids[0]
-
-        # 2) XML-ID completo module.name
-        if "." in value:
-            module, name = value.split(".", 1)
-            domain = [
-                ("module", "=", module),
-                ("name", "=", name),
-                ("model", "=", "product.category"),
-            ]
-            ids = self.client.search("ir.model.data", domain, limit=1)
-            if ids:
-                rec = self.client.read("ir.model.data", ids, ["res_id"])
-                if rec and rec[0].get("res_id"):
-                    return rec[0]["res_id"]
-
-        # 3) Solo external_id
-        ids = self.client.search(
-            "ir.model.data",
-            [("name", "=", value), ("model", "=", "product.category")],
-            limit=1,
-        )
-        if ids:
-            rec = self.client.read("ir.model.data", ids, ["res_id"])
-            if rec and rec[0].get("res_id"):
-                return rec[0]["res_id"]
-
-        # 4) Nombre de categoría
-        ids = self.client.search(
-            "product.category", [("name", "=", value)], limit=1
-        )
-        if ids:
-            return ids[0]
+        categ_id = self._cat_unified.get(value)
+        if categ_id:
+            return categ_id
 
         print(f"[WARN] Categoría no encontrada: '{value}'. Usará 'All'.")
         return None
 
-    # -------------------------------------------------------------
+    def resolve_categories(self, categories: List[str]) -> Dict[int, Optional[int]]:
+        """
+        Resuelve cada categoría distinta una sola vez (ver encode_categories).
+        Devuelve: {código: categ_id o None}
+        """
+        return {code: self.ensure_category(cat) for code, cat in enumerate(categories)}
 
-    def import_row(self, row: pd.Series) -> str:
+    # ---------- BÚSQUEDA MASIVA ----------
+    def find_existing(
+        self, keys: List[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], int]:
+        """
+        Busca con search_read masivos (de a LOOKUP_CHUNK_SIZE valores por
+        campo) los product.template existentes.
+        keys: lista de (campo, valor), con campo 'default_code' o 'name'.
+        Devuelve: {(campo, valor): template_id}
+        """
+        by_field: Dict[str, set] = {}
+        for field, value in keys:
+            by_field.setdefault(field, set()).add(value)
+
+        existing: Dict[Tuple[str, str], int] = {}
+        for field, values in by_field.items():
+            values = sorted(values)
+            for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+                recs = self.client.search_read(
+                    "product.template",
+                    [(field, "in", values[start:start + LOOKUP_CHUNK_SIZE])],
+                    ["id", field],
+                )
+                # igual que search(limit=1): gana el primero según el orden de Odoo
+                for rec in recs:
+                    existing.setdefault((field, rec[field]), rec["id"])
+        return existing
+
+    # ---------- ESCRITURA POR LOTES ----------
+    def load_batch(
+        self,
+        fields: Tuple[str, ...],
+        rows: List[Tuple[int, str, List[str]]],
+        parent_error: Optional[str] = None,
+    ) -> List[Tuple[int, bool, str]]:
         """
-        Importa/actualiza un solo product.template a partir de una fila.
-        Columnas soportadas:
-        - default_code
-        - name
-        - categ_id/id  (o 'categoria de producto / external id')
-        - supplier_code
-        - standard_price
-        - brand
-        - barcode
-        - list_price
-        - available_in_pos
-        - purchase_ok
-        - sale_ok
-        - is_storable
+        Altas o actualizaciones de todo el lote en una sola llamada a
+        product.template.load() (el mismo motor que la importación de Odoo).
+        fields: columnas de load(); '.id' al principio indica actualización.
+        rows: lista de (row_index, etiqueta, fila_de_datos)
+        Si Odoo rechaza alguna fila, load() revierte el lote completo: las filas
+        señaladas se informan como error y el resto se reenvía. Si el error no
+        indica la fila, o la llamada falla con un error de Odoo, el lote se
+        parte en mitades hasta aislar las filas culpables; los errores de red
+        se propagan. parent_error es el error del lote padre (ver _load_halves).
         """
+        try:
+            result = self.client.load(
+                "product.template", list(fields), [data for _, _, data in rows]
+            )
+        except OdooRpcError as e:
+            return self._load_failed(fields, rows, str(e), parent_error)
+        action = "update" if fields[0] == ".id" else "create"
+        if result.get("ids"):
+            return [(row_index, True, f"{action}: {label}") for row_index, label, _ in rows]
+
+        # load() indica la fila del error en 'record' (índice dentro de data)
+        by_record: Dict[int, List[str]] = {}
+        general: List[str] = []
+        for m in result.get("messages") or []:
+            if m.get("type") != "error":
+                continue
+            if m.get("record") is None:
+                general.append(m.get("message", ""))
+            else:
+                by_record.setdefault(m["record"], []).append(m.get("message", ""))
+
+        # Las filas rechazadas se informan y el resto se reenvía sin ellas
+        # (load() es transaccional: el intento fallido no dejó nada escrito)
+        failed = sorted(pos for pos in by_record if 0 <= pos < len(rows))
+        if failed:
+            results = []
+            for pos in failed:
+                row_index, label, _ = rows[pos]
+                msg = "; ".join(by_record[pos])
+                results.append((row_index, False, f"ERROR en {label}: {msg}"))
+            remaining = [row for pos, row in enumerate(rows) if pos not in by_record]
+            if remaining:
+                results += self.load_batch(fields, remaining)
+            return sorted(results)
+
+        # Error sin fila identificable
+        error = "; ".join(general) or "load() no devolvió ids"
+        return self._load_failed(fields, rows, error, parent_error)
+
+    def _load_failed(
+        self,
+        fields: Tuple[str, ...],
+        rows: List[Tuple[int, str, List[str]]],
+        error: str,
+        parent_error: Optional[str],
+    ) -> List[Tuple[int, bool, str]]:
+        """
+        Lote fallido sin filas señaladas: se parte en mitades para aislar la
+        fila culpable. Si las dos mitades repiten el error del lote padre, no
+        depende de las filas (permisos, campo inexistente, ...) y se corta la
+        búsqueda.
+        """
+        if error == parent_error:
+            raise _BatchWideError(error)
+        if len(rows) > 1:
+            return self._load_halves(fields, rows, error)
+        row_index, label, _ = rows[0]
+        return [(row_index, False, f"ERROR en {label}: {error}")]
+
+    def _load_halves(
+        self,
+        fields: Tuple[str, ...],
+        rows: List[Tuple[int, str, List[str]]],
+        error: str,
+    ) -> List[Tuple[int, bool, str]]:
+        mid = len(rows) // 2
+        head, tail = rows[:mid], rows[mid:]
+        try:
+            first = self.load_batch(fields, head, parent_error=error)
+        except _BatchWideError:
+            try:
+                second = self.load_batch(fields, tail, parent_error=error)
+            except _BatchWideError:
+                # ambas mitades fallan igual en su primer intento: falla todo el lote
+                return [
+                    (row_index, False, f"ERROR en {label}: {error}")
+                    for row_index, label, _ in rows
+                ]
+            # la segunda mitad no repite el error: está en filas de la primera
+            return self._load_failed(fields, head, error, None) + second
+        return first + self.load_batch(fields, tail)
 
-        default_code = _safe_str(row.get("default_code"))
-        name = _safe_str(row.get("name"))
-        if not name and not default_code:
-            return "(sin nombre ni código)"
 
-        # --- CATEGORÍA: soportar ambos nombres de columna ---
-        if "categ_id/id" in row:
-            category_value = _safe_str(row.get("categ_id/id"))
-        else:
-            category_value = _safe_str(row.get("categoria de producto / external id"))
+# =========================
+# ARMADO DE VALS (SIN I/O)
+# =========================
+
+def validate_dataframe(df: pd.DataFrame) -> Tuple[pd.DataFrame, List[Tuple[int, str]]]:
+    """
+    Valida la hoja completa en memoria, antes de conectar a Odoo:
+    - cada fila necesita name o default_code
+    - los precios no vacíos tienen que ser numéricos (acepta coma decimal)
+    Devuelve: (df con las filas válidas, [(row_index, mensaje), ...])
+    """
+    def text(col: str) -> pd.Series:
+        if col not in df.columns:
+            return pd.Series("", index=df.index)
+        return df[col].fillna("").astype(str).str.strip()
+
+    codes = text("default_code")
+    names = text("name")
+    checks = [((codes == "") & (names == ""), "sin nombre ni código")]
+    for col in FLOAT_COLUMNS:
+        raw = text(col)
+        parsed = pd.to_numeric(raw.str.replace(",", ".", regex=False), errors="coerce")
+        checks.append(((raw != "") & parsed.isna(), f"{col} no numérico"))
+
+    bad = pd.Series(False, index=df.index)
+    for mask, _ in checks:
+        bad |= mask
+
+    bad_rows: List[Tuple[int, str]] = []
+    for idx in df.index[bad]:
+        reasons = ", ".join(reason for mask, reason in checks if mask[idx])
+        label = codes[idx] or names[idx] or "(sin identificador)"
+        bad_rows.append((idx, f"ERROR en {label}: {reasons}"))
+    return df[~bad], bad_rows
+
+
+def prepare_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Coerciona las columnas conocidas una sola vez, a nivel de columna:
+    booleanos, precios (acepta coma decimal) y textos sin espacios ni NaN.
+    Así build_vals recibe valores ya tipados.
+    """
+    for col in BOOL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip().str.lower().isin(_TRUE_SET)
+
+    for col in FLOAT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(
+                df[col].astype(str).str.strip().str.replace(",", ".", regex=False),
+                errors="coerce",
+            ).fillna(0.0)
+
+    str_cols = [col for col in STR_COLUMNS if col in df.columns]
+    if str_cols:
+        df[str_cols] = df[str_cols].fillna("").astype(str).apply(lambda s: s.str.strip())
+
+    return df
 
-        categ_id = self.ensure_category(category_value)
 
-        supplier_code = _safe_str(row.get("supplier_code"))
-        brand_name = _safe_str(row.get("brand"))
+def drop_duplicate_codes(df: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+    """
+    Descarta filas con default_code repetido, quedándose con la última
+    (la más reciente del export). Las filas sin código no se tocan.
+    Se aplica a la hoja cruda, antes de validar: si la última fila de un
+    código es inválida, el código entero queda como error.
+    Devuelve: (df, cantidad descartada)
+    """
+    if "default_code" not in df.columns:
+        return df, 0
+    codes = df["default_code"].fillna("").astype(str).str.strip()
+    dup = (codes != "") & codes.duplicated(keep="last")
+    return df[~dup], int(dup.sum())
+
+
+def iter_rows(df: pd.DataFrame) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Recorre las filas del DataFrame de a una como (row_index, dict).
+    row_index es la posición original en la hoja.
+    """
+    columns = list(df.columns)
+    for idx, values in zip(df.index, df.itertuples(index=False, name=None)):
+        yield idx, dict(zip(columns, values))
+
+
+def encode_categories(df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Convierte la columna de categoría ('categ_id/id' o
+    'categoria de producto / external id') a Categorical y guarda el código
+    entero de cada fila en CATEG_CODE_COLUMN (-1 = sin columna).
+    Devuelve: (df, categorías distintas; la posición es el código)
+    """
+    if "categ_id/id" in df.columns:
+        column = "categ_id/id"
+    else:
+        column = "categoria de producto / external id"
+    if column not in df.columns:
+        df[CATEG_CODE_COLUMN] = -1
+        return df, []
+    cats = df[column].astype("category")
+    df[CATEG_CODE_COLUMN] = cats.cat.codes
+    return df, list(cats.cat.categories)
+
+
+def build_vals(
+    row: Dict[str, Any], categ_ids: Dict[int, Optional[int]]
+) -> Tuple[Optional[Tuple[str, str]], Dict[str, Any]]:
+    """
+    Arma los vals de un product.template a partir de una fila, sin tocar Odoo.
+    categ_ids: resultado de ProductImporter.resolve_categories; la fila trae
+    el código de su categoría en CATEG_CODE_COLUMN.
+    Devuelve: (search_key, vals); search_key es None si la fila no tiene
+    nombre ni código.
+    Columnas soportadas:
+    - default_code
+    - name
+    - categ_id/id  (o 'categoria de producto / external id')
+    - supplier_code
+    - standard_price
+    - brand
+    - barcode
+    - list_price
+    - available_in_pos
+    - purchase_ok
+    - sale_ok
+    - is_storable
+    """
 
-        barcode = _safe_str(row.get("barcode"))
-        if barcode.lower() == "nan":
-            barcode = ""
+    default_code = _safe_str(row.get("default_code"))
+    name = _safe_str(row.get("name"))
+    if not name and not default_code:
+        return None, {}
 
-        list_price = _to_float(row.get("list_price"))
-        standard_price = _to_float(row.get("standard_price"))
+    categ_id = categ_ids.get(row.get(CATEG_CODE_COLUMN, -1))
 
-        available_in_pos = _to_bool(row.get("available_in_pos"))
-        purchase_ok = _to_bool(row.get("purchase_ok"))
-        sale_ok = _to_bool(row.get("sale_ok"))
+    supplier_code = _safe_str(row.get("supplier_code"))
+    brand_name = _safe_str(row.get("brand"))
 
-        # campo boolean custom
-        is_storable_flag = _to_bool(row.get("is_storable"))
+    barcode = _safe_str(row.get("barcode"))
 
-        # --- armamos vals ---
-        vals: Dict[str, Any] = {}
+    list_price = _to_float(row.get("list_price"))
+    standard_price = _to_float(row.get("standard_price"))
 
-        if name:
-            vals["name"] = name
-        if default_code:
-            vals["default_code"] = default_code
-        if barcode:
-            vals["barcode"] = barcode
-        if list_price:
-            vals["list_price"] = list_price
-        if standard_price:
-            vals["standard_price"] = standard_price
+    available_in_pos = _to_bool(row.get("available_in_pos"))
+    purchase_ok = _to_bool(row.get("purchase_ok"))
+    sale_ok = _to_bool(row.get("sale_ok"))
 
-        if supplier_code:
-            vals["supplier_code"] = supplier_code
+    # campo boolean custom
+    is_storable_flag = _to_bool(row.get("is_storable"))
 
-        if brand_name:
-            vals["brand"] = brand_name
+    # --- armamos vals ---
+    vals: Dict[str, Any] = {}
 
-        vals["available_in_pos"] = bool(available_in_pos)
-        vals["purchase_ok"] = bool(purchase_ok)
-        vals["sale_ok"] = bool(sale_ok)
+    if name:
+        vals["name"] = name
+    if default_code:
+        vals["default_code"] = default_code
+    if barcode:
+        vals["barcode"] = barcode
+    if list_price:
+        vals["list_price"] = list_price
+    if standard_price:
+        vals["standard_price"] = standard_price
 
-        # campo custom booleano is_storable
-        vals["is_storable"] = bool(is_storable_flag)
+    if supplier_code:
+        vals["supplier_code"] = supplier_code
 
-        if categ_id:
-            vals["categ_id"] = categ_id
+    if brand_name:
+        vals["brand"] = brand_name
 
-        # --- Buscar producto ---
-        if default_code:
-            search = [("default_code", "=", default_code)]
-        else:
-            search = [("name", "=", name)]
+    vals["available_in_pos"] = bool(available_in_pos)
+    vals["purchase_ok"] = bool(purchase_ok)
+    vals["sale_ok"] = bool(sale_ok)
+
+    # campo custom booleano is_storable
+    vals["is_storable"] = bool(is_storable_flag)
+
+    if categ_id:
+        vals["categ_id"] = categ_id
 
-        ids = self.client.search("product.template", search, limit=1)
+    # --- Clave de búsqueda del producto ---
+    if default_code:
+        return ("default_code", default_code), vals
+    return ("name", name), vals
 
-        if ids:
-            self.client.write("product.template", [ids[0]], vals)
-            return f"update: {default_code or name}"
+
+def _xmlid_for(default_code: str) -> str:
+    """
+    External id estable por default_code para que load() haga upsert.
+    Los caracteres fuera de [0-9A-Za-z] se escapan como _<hex>_ (sin colisiones).
+    """
+    safe = "".join(
+        c if c.isascii() and c.isalnum() else f"_{ord(c):x}_" for c in default_code
+    )
+    return f"{XMLID_PREFIX}{safe}"
+
+
+def _load_value(v: Any) -> str:
+    # load() recibe todo como texto, igual que una planilla de Odoo
+    if isinstance(v, bool):
+        return "1" if v else "0"
+    return str(v)
+
+
+def plan_batches(
+    built: List[Tuple[int, Optional[Tuple[str, str]], Dict[str, Any]]],
+    existing: Dict[Tuple[str, str], int],
+) -> List[Tuple[Tuple[str, ...], List[Tuple[int, str, List[str]]]]]:
+    """
+    Arma los lotes para ProductImporter.load_batch:
+    - actualizaciones: columna '.id' con el template existente
+    - altas con código: columna 'id' con el external id de _xmlid_for
+    - altas sin código: sin columna de id
+    Las filas se agrupan por columnas presentes (build_vals omite los vacíos,
+    así load() no borra valores existentes) y se cortan de a BATCH_SIZE.
+    Devuelve: [(fields, [(row_index, etiqueta, fila_de_datos), ...]), ...]
+    """
+    groups: Dict[Tuple[str, ...], List[Tuple[int, str, List[str]]]] = {}
+
+    for row_index, key, vals in built:
+        label = key[1]
+        columns = tuple(LOAD_FIELD_NAMES.get(f, f) for f in vals)
+        data = [_load_value(v) for v in vals.values()]
+        template_id = existing.get(key)
+        if template_id:
+            fields = (".id",) + columns
+            data.insert(0, str(template_id))
+        elif key[0] == "default_code":
+            fields = ("id",) + columns
+            data.insert(0, _xmlid_for(key[1]))
         else:
-            self.client.create("product.template", vals)
-            return f"create: {default_code or name}"
+            fields = columns
+        groups.setdefault(fields, []).append((row_index, label, data))
+
+    tasks = []
+    for fields, rows in groups.items():
+        for start in range(0, len(rows), BATCH_SIZE):
+            tasks.append((fields, rows[start:start + BATCH_SIZE]))
+    return tasks
 
 
 # =========================
 # THREAD-LOCAL IMPORTER
 # =========================
 
-def get_thread_importer(base_dir: str) -> ProductImporter:
+def get_thread_importer(base_dir: str, session: requests.Session) -> ProductImporter:
     """
-    Crea un OdooClient + ProductImporter por hilo y los reutiliza.
+    Crea un OdooJsonClient + ProductImporter por hilo y los reutiliza.
+    Son envoltorios livianos: comparten la sesión HTTP (keep-alive), el uid
+    cacheado por OdooJsonClient.authenticate y el índice de categorías.
     """
     if not hasattr(_thread_local, "importer"):
-        client = OdooClient(ODOO_URL, ODOO_DB, ODOO_USER, ODOO_PASSWORD)
+        client = OdooJsonClient(
+            ODOO_URL, ODOO_DB, ODOO_USER, ODOO_PASSWORD, session=session
+        )
         _thread_local.importer = ProductImporter(client, base_dir=base_dir)
     return _thread_local.importer
 
 
-def worker_task(
-    args: Tuple[int, Dict[str, Any], str, bool]
-) -> Tuple[int, bool, str]:
+def clamp_workers(requested: int) -> int:
     """
-    Función que ejecuta cada hilo.
-    Devuelve: (row_index, ok, mensaje)
+    Limita --workers a ODOO_MAX_WORKERS (o a los núcleos, mínimo 2).
+    Más clientes que workers de Odoo sólo hacen cola del lado del servidor.
     """
-    row_index, row_dict, base_dir, dry_run = args
-    row = pd.Series(row_dict)
+    if requested > WORKERS_WARN_THRESHOLD:
+        print(
+            f"[WARN] --workers {requested} es demasiado para una sola instancia "
+            "de Odoo; las llamadas se encolan en el servidor."
+        )
+    return max(1, min(requested, _max_workers_cap()))
 
+
+def _max_workers_cap() -> int:
+    """
+    Tope de hilos: ODOO_MAX_WORKERS si es un entero válido, si no los núcleos
+    (mínimo 2). Un valor menor a 1 es un error de configuración.
+    """
+    default = max(2, os.cpu_count() or 1)
+    if not ODOO_MAX_WORKERS:
+        return default
     try:
-        if dry_run:
-            return row_index, True, "(dry-run)"
+        cap = int(ODOO_MAX_WORKERS)
+    except ValueError:
+        print(
+            f"[WARN] ODOO_MAX_WORKERS='{ODOO_MAX_WORKERS}' no es un número; "
+            f"se usa {default}."
+        )
+        return default
+    if cap < 1:
+        print(f"ERROR: ODOO_MAX_WORKERS debe ser 1 o más (recibido: {cap})")
+        sys.exit(1)
+    return cap
+
+
+def prewarm_importers(
+    executor: ThreadPoolExecutor, workers: int, base_dir: str, session: requests.Session
+) -> None:
+    """
+    Abre en paralelo las conexiones del pool HTTP antes de la importación,
+    para que los handshakes TLS no caigan en los primeros lotes.
+    La barrera obliga al pool a levantar los `workers` hilos y a que todos
+    hagan su primera llamada a la vez (una conexión por hilo).
+    """
+    barrier = threading.Barrier(workers)
+
+    def warm() -> None:
+        try:
+            barrier.wait(timeout=60)
+        except threading.BrokenBarrierError:
+            pass
+        try:
+            get_thread_importer(base_dir, session).client.version()
+        except Exception:
+            pass  # se reintenta (y se informa) en el primer lote del hilo
+
+    for fut in [executor.submit(warm) for _ in range(workers)]:
+        fut.result()
+
 
-        importer = get_thread_importer(base_dir)
-        label = importer.import_row(row)
-        return row_index, True, label
+def worker_task(
+    args: Tuple[Tuple, str, requests.Session]
+) -> List[Tuple[int, bool, str]]:
+    """
+    Función que ejecuta cada hilo: un lote de product.template.load().
+    Devuelve: [(row_index, ok, mensaje), ...]
+    """
+    (fields, rows), base_dir, session = args
+
+    try:
+        importer = get_thread_importer(base_dir, session)
+        return importer.load_batch(fields, rows)
 
     except Exception as e:
-        dc = _safe_str(row_dict.get("default_code"))
-        name = _safe_str(row_dict.get("name"))
-        msg = f"ERROR en {dc or name or '(sin identificador)'}: {e}"
-        return row_index, False, msg
+        return [
+            (row_index, False, f"ERROR en {label}: {e}")
+            for row_index, label, _ in rows
+        ]
+
+
+# =========================
+# LECTURA DEL EXCEL
+# =========================
+
+def read_sheet(excel_path: str, sheet_name: Optional[str] = None) -> pd.DataFrame:
+    """
+    Lee la hoja con todas las celdas como texto (dtype=str), así los códigos
+    y barcodes no pasan por float. Usa calamine si está instalado
+    (python-calamine); si no, openpyxl, que pandas ya abre en modo read_only.
+    """
+    sheet = sheet_name if sheet_name else 0
+    try:
+        return pd.read_excel(excel_path, sheet_name=sheet, engine="calamine", dtype=str)
+    except (ImportError, ValueError):
+        # sin python-calamine o pandas < 2.2 (engine desconocido)
+        return pd.read_excel(excel_path, sheet_name=sheet, engine="openpyxl", dtype=str)
 
 
 # =========================
@@ -313,6 +822,7 @@ def main():
         help="Cantidad de hilos (default: 4)",
     )
     args = parser.parse_args()
+    args.workers = clamp_workers(args.workers)
 
     excel_path = args.file
     if not os.path.exists(excel_path):
@@ -321,10 +831,7 @@ def main():
 
     # Leer Excel
     try:
-        if args.sheet_name:
-            df = pd.read_excel(excel_path, sheet_name=args.sheet_name)
-        else:
-            df = pd.read_excel(excel_path)
+        df = read_sheet(excel_path, args.sheet_name)
     except Exception as e:
         print(f"ERROR al leer el Excel: {e}")
         sys.exit(1)
@@ -335,6 +842,13 @@ def main():
         print("No hay filas para procesar.")
         sys.exit(0)
 
+    df, dup_count = drop_duplicate_codes(df)
+    if dup_count:
+        print(f"Filas con default_code duplicado descartadas: {dup_count}")
+
+    df, bad_rows = validate_dataframe(df)
+    df = prepare_dataframe(df)
+
     base_dir = os.path.dirname(os.path.abspath(excel_path))
 
     print(
@@ -342,29 +856,90 @@ def main():
         f"(workers={args.workers})..."
     )
 
-    records = df.to_dict("records")
-    tasks = [
-        (idx, records[idx], base_dir, args.dry_run)
-        for idx in range(total)
-    ]
-
     ok_count = 0
     err_count = 0
 
-    print(f"Filas a procesar: {total}")
+    print(f"Filas a procesar: {len(df)}")
+    if bad_rows:
+        print(f"Filas inválidas (no se envían a Odoo): {len(bad_rows)}")
     print("Inicio de importación...\n")
 
-    with ThreadPoolExecutor(max_workers=args.workers) as executor:
-        # executor.map preserva el orden de las filas originales
-        for processed, result in enumerate(executor.map(worker_task, tasks), start=1):
-            row_index, ok, msg = result
+    # Las líneas por fila se acumulan y se escriben de a OUTPUT_FLUSH_EVERY
+    out: List[str] = []
+
+    def flush_output() -> None:
+        if out:
+            sys.stdout.write("\n".join(out) + "\n")
+            sys.stdout.flush()
+            out.clear()
+
+    def report(results: List[Tuple[int, bool, str]]) -> None:
+        nonlocal ok_count, err_count
+        for row_index, ok, msg in results:
             row_num = row_index + 1
             if ok:
                 ok_count += 1
-                print(f"[{row_num}/{total}] OK -> {msg}")
+                out.append(f"[{row_num}/{total}] OK -> {msg}")
             else:
                 err_count += 1
-                print(f"[{row_num}/{total}] {msg}")
+                out.append(f"[{row_num}/{total}] {msg}")
+        if len(out) >= OUTPUT_FLUSH_EVERY:
+            flush_output()
+
+    report([(idx, False, msg) for idx, msg in bad_rows])
+
+    if args.dry_run:
+        report([(idx, True, "(dry-run)") for idx in df.index])
+    else:
+        # Armado de vals en memoria: las categorías distintas se resuelven una vez
+        session = make_session(args.workers)
+        try:
+            importer = get_thread_importer(base_dir, session)
+        except Exception as e:
+            flush_output()
+            print(f"ERROR al conectar con Odoo: {e}")
+            sys.exit(1)
+
+        df, categories = encode_categories(df)
+        categ_ids = importer.resolve_categories(categories)
+
+        # Las filas se recorren en streaming, sin materializar una lista de dicts
+        built = []
+        for idx, rec in iter_rows(df):
+            key, vals = build_vals(rec, categ_ids)
+            if key is None:
+                # validate_dataframe ya las descarta; mismo mensaje por si acaso
+                report([(idx, False, "ERROR en (sin identificador): sin nombre ni código")])
+                continue
+            built.append((idx, key, vals))
+        # Ya no se necesita el DataFrame: liberar el buffer antes de despachar
+        del df
+
+        # Un search_read masivo decide alta vs actualización
+        try:
+            existing = importer.find_existing([key for _, key, _ in built])
+        except Exception as e:
+            flush_output()
+            print(f"ERROR al buscar productos existentes en Odoo: {e}")
+            sys.exit(1)
+        tasks = [(task, base_dir, session) for task in plan_batches(built, existing)]
+
+        # Los hilos paralelizan entre lotes, no entre filas.
+        # as_completed informa cada lote apenas termina (sin esperar a los lentos)
+        executor = ThreadPoolExecutor(max_workers=args.workers)
+        try:
+            prewarm_importers(executor, args.workers, base_dir, session)
+            futures = [executor.submit(worker_task, task) for task in tasks]
+            for fut in as_completed(futures):
+                report(fut.result())
+        except BaseException:
+            # Ctrl-C o error inesperado: descartar los lotes pendientes
+            executor.shutdown(wait=False, cancel_futures=True)
+            flush_output()
+            raise
+        executor.shutdown()
+
+    flush_output()
 
     print("\n============================")
     print("FIN DE IMPORTACIÓN")